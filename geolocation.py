@@ -11,7 +11,39 @@ def get_user_location():
     # JavaScript コードで位置情報を取得
     location_component = """
     <script>
-    function getLocation() {
+    const CACHE_KEY = 'hita_user_loc';
+    const CACHE_TTL_MS = 2 * 60 * 60 * 1000;  // 2時間
+
+    function loadCachedLocation() {
+        // localStorageに有効期限内の位置情報があればそれを返す
+        try {
+            const stored = localStorage.getItem(CACHE_KEY);
+            if (stored) {
+                const cached = JSON.parse(stored);
+                if (Date.now() - cached.ts < CACHE_TTL_MS) {
+                    return cached;
+                }
+            }
+        } catch (e) {
+            // 壊れたキャッシュは無視して再取得にフォールバック
+        }
+        return null;
+    }
+
+    function getLocation(force) {
+        // 再取得ボタン以外はキャッシュを優先し、GPS/IPへの問い合わせを省く
+        if (!force) {
+            const cached = loadCachedLocation();
+            if (cached) {
+                window.parent.postMessage({
+                    type: 'streamlit:location',
+                    data: cached
+                }, '*');
+                document.getElementById('status').innerHTML =
+                    `位置情報取得成功（キャッシュ）<br>緯度: ${cached.lat.toFixed(6)}<br>経度: ${cached.lon.toFixed(6)}`;
+                return;
+            }
+        }
         if (navigator.geolocation) {
             navigator.geolocation.getCurrentPosition(
                 function(position) {
@@ -20,14 +52,26 @@ def get_user_location():
                         lon: position.coords.longitude,
                         accuracy: position.coords.accuracy
                     };
-                    
+
+                    // 次回以降の再実行用にキャッシュへ保存
+                    try {
+                        localStorage.setItem(CACHE_KEY, JSON.stringify({
+                            lat: location.lat,
+                            lon: location.lon,
+                            accuracy: location.accuracy,
+                            ts: Date.now()
+                        }));
+                    } catch (e) {
+                        // ストレージが使えない環境では保存をあきらめる
+                    }
+
                     // Streamlitに結果を送信
                     window.parent.postMessage({
                         type: 'streamlit:location',
                         data: location
                     }, '*');
-                    
-                    document.getElementById('status').innerHTML = 
+
+                    document.getElementById('status').innerHTML =
                         `位置情報取得成功！<br>緯度: ${location.lat.toFixed(6)}<br>経度: ${location.lon.toFixed(6)}`;
                 },
                 function(error) {
@@ -109,7 +153,7 @@ def get_user_location():
     <div class="location-container">
         <h3>📍 位置情報取得</h3>
         <div id="status" class="status">位置情報を取得中...</div>
-        <button class="retry-button" onclick="getLocation()">再取得</button>
+        <button class="retry-button" onclick="getLocation(true)">再取得</button>
     </div>
     """
     
@@ -1,56 +1,291 @@
 import math
+from dataclasses import dataclass
+
 import pandas as pd
 import numpy as np
 
+# Numbaは任意依存。あればスカラー距離カーネルをネイティブコンパイルする
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# scikit-learnも任意依存。あれば最近傍検索をBallTreeで高速化する
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:
+    BallTree = None
+
+def _hubeny_km(lat1_rad, lon1_rad, lat2_rad, lon2_rad):
+    """
+    ヒュベニの公式による距離計算（スカラー版カーネル）
+    Numbaが利用可能な場合は@njitでコンパイルされ、1回あたりの
+    呼び出しコストがCPythonのバイトコード実行から機械語に下がる
+    Args:
+        lat1_rad, lon1_rad: 地点1の緯度・経度（ラジアン）
+        lat2_rad, lon2_rad: 地点2の緯度・経度（ラジアン）
+    Returns:
+        距離（km）
+    """
+    # 平均緯度
+    P = (lat1_rad + lat2_rad) / 2
+
+    # 緯度・経度の差
+    Dy = lat1_rad - lat2_rad
+    Dx = lon1_rad - lon2_rad
+
+    # 地球楕円体のパラメータ（WGS84）
+    a = 6378137.0  # 長半径（m）
+    b = 6356752.314245  # 短半径（m）
+    e2 = (a**2 - b**2) / a**2  # 第一離心率の二乗
+
+    # 子午線曲率半径
+    M = a * (1 - e2) / math.pow(1 - e2 * math.sin(P)**2, 1.5)
+
+    # 卯酉線曲率半径
+    N = a / math.sqrt(1 - e2 * math.sin(P)**2)
+
+    # ヒュベニの公式による距離計算
+    distance = math.sqrt((Dy * M)**2 + (Dx * N * math.cos(P))**2)
+
+    # メートルからキロメートルに変換
+    return distance / 1000
+
+if numba is not None:
+    _hubeny_km = numba.njit(cache=True, fastmath=True)(_hubeny_km)
+
+def _calc_distance_rad(lat1_rad, lon1_rad, lat2_rad, lon2_rad):
+    """
+    ヒュベニの公式による距離計算（ラジアン入力版）
+    事前にラジアン変換済みの座標を受け取るため、変換コストを
+    繰り返し計算の外に追い出せる
+    Args:
+        lat1_rad, lon1_rad: 地点1の緯度・経度（ラジアン）
+        lat2_rad, lon2_rad: 地点2の緯度・経度（ラジアン）
+    Returns:
+        距離（km、入力に応じてスカラーまたはndarray）
+    """
+    # 平均緯度
+    P = (lat1_rad + lat2_rad) / 2
+
+    # 緯度・経度の差
+    Dy = lat1_rad - lat2_rad
+    Dx = lon1_rad - lon2_rad
+
+    # 地球楕円体のパラメータ（WGS84）
+    a = 6378137.0  # 長半径（m）
+    b = 6356752.314245  # 短半径（m）
+    e2 = (a**2 - b**2) / a**2  # 第一離心率の二乗
+
+    # 子午線曲率半径
+    M = a * (1 - e2) / np.power(1 - e2 * np.sin(P)**2, 1.5)
+
+    # 卯酉線曲率半径
+    N = a / np.sqrt(1 - e2 * np.sin(P)**2)
+
+    # ヒュベニの公式による距離計算
+    distance = np.sqrt((Dy * M)**2 + (Dx * N * np.cos(P))**2)
+
+    # メートルからキロメートルに変換
+    return distance / 1000
+
+def _two_opt_core(route, dist_matrix):
+    """
+    2-opt法の改善ループ本体
+    routeのndarrayを破壊的に並べ替える。Numbaが利用可能な場合は
+    @njitでコンパイルされ、二重ループがネイティブコードで回る
+    Args:
+        route: 訪問順の番号配列（int64のndarray）
+        dist_matrix: スポット間の距離行列
+    """
+    n = route.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                # 区間[i, j]を反転した場合の前後の辺の距離差
+                before = dist_matrix[route[i - 1], route[i]]
+                after = dist_matrix[route[i - 1], route[j]]
+                if j < n - 1:
+                    before += dist_matrix[route[j], route[j + 1]]
+                    after += dist_matrix[route[i], route[j + 1]]
+                if after < before - 1e-9:
+                    lo, hi = i, j
+                    while lo < hi:
+                        route[lo], route[hi] = route[hi], route[lo]
+                        lo += 1
+                        hi -= 1
+                    improved = True
+
+if numba is not None:
+    _two_opt_core = numba.njit(cache=True)(_two_opt_core)
+
+def _two_opt(route_idx, dist_matrix):
+    """
+    2-opt法による経路改善
+    貪欲法で得た訪問順に対し、部分区間の反転で総移動距離が短くなる
+    限り付け替えを繰り返す。距離は事前計算済みの行列参照のみで済む
+    ため、追加の距離計算は発生しない
+    Args:
+        route_idx: 訪問順のローカル番号リスト
+        dist_matrix: スポット間の距離行列
+    Returns:
+        改善後の訪問順（ローカル番号リスト）
+    """
+    route = np.asarray(route_idx, dtype=np.int64)
+    _two_opt_core(route, dist_matrix)
+    return route.tolist()
+
+def _min_max_scale(values):
+    """
+    値を[0, 1]の範囲へミンマックス正規化する
+    Args:
+        values: 正規化対象のndarray
+    Returns:
+        正規化後のndarray（全要素が同値の場合はすべて0）
+    """
+    shifted = values - values.min()
+    return shifted / (shifted.max() + 1e-12)
+
+def _assign_ranks(values, descending=False):
+    """
+    値の昇順（descending=Trueなら降順）に1始まりのランクを割り当てる
+    Args:
+        values: ランク付け対象のndarray
+        descending: Trueなら値が大きいほどランクが低い
+    Returns:
+        各要素のランク（ndarray）
+    """
+    order = np.argsort(-values if descending else values, kind='stable')
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+@dataclass(frozen=True)
+class TourismCtx:
+    """観光スポットデータの前計算済みコンテキスト
+
+    DataFrameから派生する座標配列・属性配列・名前索引・距離行列を
+    一度だけ構築して束ねる。Streamlit側では@st.cache_resourceで
+    キャッシュし、再実行間で共有する想定
+    """
+    df: pd.DataFrame
+    names: list
+    lats: np.ndarray  # 緯度（ラジアン）
+    lons: np.ndarray  # 経度（ラジアン）
+    times: np.ndarray
+    recs: np.ndarray
+    idx: dict
+    xyz: np.ndarray  # ECEF直交座標（m）
+    D: np.ndarray
+    latlon_str: list  # 「緯度,経度」形式（度）の文字列。地図URL用
+
+    @classmethod
+    def from_df(cls, spots_df):
+        """
+        観光スポットのDataFrameからコンテキストを構築
+        Args:
+            spots_df: 観光スポットのDataFrame
+        Returns:
+            TourismCtx
+        """
+        # 幾何配列はfloat32で持つ。市内スケールでは10kmの基線に対して
+        # メートル未満の精度が残り、スポット数が増えても距離行列の
+        # メモリ量とSIMD演算のスループットが有利になる
+        # （Google Maps URL用の度数はDataFrameのfloat64列をそのまま使う）
+        lats = np.radians(spots_df['緯度'].to_numpy(dtype=np.float32))
+        lons = np.radians(spots_df['経度'].to_numpy(dtype=np.float32))
+        names = list(spots_df['スポット名'])
+
+        # 全スポットをECEF直交座標に変換し、距離行列は差ベクトルの
+        # ノルムとして一括計算する。市内スケールではヒュベニとの差は
+        # 0.3%未満で、三角関数は変換時のN回分しか使わない
+        R = np.float32(6371000.0)  # 地球の平均半径（m）
+        xyz = np.column_stack((
+            R * np.cos(lats) * np.cos(lons),
+            R * np.cos(lats) * np.sin(lons),
+            R * np.sin(lats),
+        ))
+
+        return cls(
+            df=spots_df,
+            names=names,
+            lats=lats,
+            lons=lons,
+            times=spots_df['最低所要時間'].to_numpy(),
+            recs=spots_df['おすすめ度'].to_numpy(),
+            idx={name: i for i, name in enumerate(names)},
+            xyz=xyz,
+            D=np.linalg.norm(xyz[:, None, :] - xyz[None, :, :], axis=-1) / 1000,
+            latlon_str=[
+                f"{lat},{lon}"
+                for lat, lon in zip(spots_df['緯度'], spots_df['経度'])
+            ],
+        )
+
 class RouteOptimizer:
     """観光ルート最適化クラス"""
-    
-    def __init__(self, spots_df):
+
+    def __init__(self, spots):
         """
         初期化
         Args:
-            spots_df: 観光スポットのDataFrame
+            spots: 観光スポットのDataFrame、または前計算済みのTourismCtx
         """
-        self.spots_df = spots_df
+        ctx = spots if isinstance(spots, TourismCtx) else TourismCtx.from_df(spots)
+        self.ctx = ctx
+        self.spots_df = ctx.df
+        # ラジアン座標の連続配列と名前→行番号の索引はctxから引き継ぐ
+        self._coords = np.column_stack((ctx.lats, ctx.lons))
+        self._names = ctx.names
+        self._name_to_idx = ctx.idx
+        # 全スポット間の距離行列（ctx構築時に一括計算済み）
+        self.D = ctx.D
+        # scikit-learnがあれば全スポットのBallTreeを一度だけ構築し、
+        # 現在位置からの最近傍検索に使う
+        self._ball_tree = (
+            BallTree(self._coords, metric='haversine')
+            if BallTree is not None else None
+        )
+        # 簡易距離計算（fastモード）用に全スポットの平均緯度の余弦を前計算
+        self._mean_lat_cos = math.cos(float(ctx.lats.mean()))
+        # スポット名による属性参照をO(1)にするためのインデックス
+        self._by_name = ctx.df.set_index('スポット名')
+        # おすすめ度・効率スコアもndarrayとして保持し、添字参照で使う
+        self._recommend_all = ctx.recs
+        # 効率スコア（おすすめ度/最低所要時間）はスポットごとに固定なので前計算
+        self._efficiency_all = (ctx.recs / ctx.times).astype(float)
+        # 効率降順に並べたスポット名。部分集合のランキングはこのリストを
+        # 先頭から走査して連番を振り直すだけで得られる
+        self._pre_sorted_by_eff = [
+            ctx.names[i]
+            for i in np.argsort(-self._efficiency_all, kind='stable')
+        ]
     
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
+    def calculate_distance(self, lat1, lon1, lat2, lon2, fast=False):
         """
-        ヒュベニの公式を使用して2点間の距離を計算
+        2点間の距離を計算
+        デフォルトはヒュベニの公式。fast=Trueの場合は平均緯度まわりの
+        正距円筒近似を使う。市内スケール（50km未満）では誤差0.1%未満で、
+        三角関数の呼び出しを前計算済みの余弦1つに削減できる
         Args:
             lat1, lon1: 地点1の緯度・経度
             lat2, lon2: 地点2の緯度・経度
+            fast: Trueなら正距円筒近似で計算
         Returns:
             距離（km）
         """
-        # 度をラジアンに変換
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        # 平均緯度
-        P = (lat1_rad + lat2_rad) / 2
-        
-        # 緯度・経度の差
-        Dy = lat1_rad - lat2_rad
-        Dx = lon1_rad - lon2_rad
-        
-        # 地球楕円体のパラメータ（WGS84）
-        a = 6378137.0  # 長半径（m）
-        b = 6356752.314245  # 短半径（m）
-        e2 = (a**2 - b**2) / a**2  # 第一離心率の二乗
-        
-        # 子午線曲率半径
-        M = a * (1 - e2) / math.pow(1 - e2 * math.sin(P)**2, 1.5)
-        
-        # 卯酉線曲率半径
-        N = a / math.sqrt(1 - e2 * math.sin(P)**2)
-        
-        # ヒュベニの公式による距離計算
-        distance = math.sqrt((Dy * M)**2 + (Dx * N * math.cos(P))**2)
-        
-        # メートルからキロメートルに変換
-        return distance / 1000
+        if fast:
+            R = 6371.0  # 地球の平均半径（km）
+            dx = math.radians(lon2 - lon1) * self._mean_lat_cos * R
+            dy = math.radians(lat2 - lat1) * R
+            return math.hypot(dx, dy)
+
+        return _hubeny_km(
+            math.radians(lat1), math.radians(lon1),
+            math.radians(lat2), math.radians(lon2)
+        )
     
     def calculate_distance_matrix(self, spots):
         """
@@ -60,23 +295,22 @@ class RouteOptimizer:
         Returns:
             距離行列（DataFrame）
         """
-        n = len(spots)
-        distance_matrix = np.zeros((n, n))
-        
-        for i, spot1 in enumerate(spots):
-            for j, spot2 in enumerate(spots):
-                if i != j:
-                    spot1_data = self.spots_df[self.spots_df['スポット名'] == spot1].iloc[0]
-                    spot2_data = self.spots_df[self.spots_df['スポット名'] == spot2].iloc[0]
-                    
-                    distance = self.calculate_distance(
-                        spot1_data['緯度'], spot1_data['経度'],
-                        spot2_data['緯度'], spot2_data['経度']
-                    )
-                    distance_matrix[i][j] = distance
-        
-        return pd.DataFrame(distance_matrix, index=spots, columns=spots)
+        # 事前計算済みの全スポット距離行列から該当部分を切り出すだけ
+        return pd.DataFrame(
+            self._build_dist_matrix(spots), index=spots, columns=spots
+        )
     
+    def _build_dist_matrix(self, spots):
+        """
+        スポット間の距離行列を事前計算済みのself.Dから切り出す
+        Args:
+            spots: スポット名のリスト
+        Returns:
+            距離行列（(K, K)のndarray、spotsの順に対応）
+        """
+        idx = [self._name_to_idx[s] for s in spots]
+        return self.D[np.ix_(idx, idx)]
+
     def calculate_time_decrease_rate_ranking(self, spots, current_time=0):
         """
         所要時間減少率ランキングを計算
@@ -86,21 +320,17 @@ class RouteOptimizer:
         Returns:
             ランキング辞書（スポット名: ランク）
         """
-        time_efficiency = {}
-        
-        for spot in spots:
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            # 所要時間とおすすめ度を考慮した効率スコア
-            efficiency = spot_data['おすすめ度'] / spot_data['最低所要時間']
-            time_efficiency[spot] = efficiency
-        
-        # 効率の高い順にソート（効率が高い=ランクが低い）
-        sorted_spots = sorted(time_efficiency.items(), key=lambda x: x[1], reverse=True)
-        
+        # 効率降順の事前ソート列を走査し、対象スポットだけに連番を振る
+        # （ソート不要のO(N)で効率の高い順ランキングが得られる）
+        members = set(spots)
         ranking = {}
-        for rank, (spot, _) in enumerate(sorted_spots, 1):
-            ranking[spot] = rank
-        
+        rank = 1
+        for name in self._pre_sorted_by_eff:
+            if name in members:
+                ranking[name] = rank
+                rank += 1
+                if rank > len(members):
+                    break
         return ranking
     
     def calculate_distance_ranking(self, current_spot, remaining_spots):
@@ -116,25 +346,14 @@ class RouteOptimizer:
             # 開始地点が不明な場合は均等なランクを返す
             return {spot: 1 for spot in remaining_spots}
         
-        distances = {}
-        current_spot_data = self.spots_df[self.spots_df['スポット名'] == current_spot].iloc[0]
-        
-        for spot in remaining_spots:
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            distance = self.calculate_distance(
-                current_spot_data['緯度'], current_spot_data['経度'],
-                spot_data['緯度'], spot_data['経度']
-            )
-            distances[spot] = distance
-        
-        # 距離の近い順にソート（距離が近い=ランクが低い）
-        sorted_spots = sorted(distances.items(), key=lambda x: x[1])
-        
-        ranking = {}
-        for rank, (spot, _) in enumerate(sorted_spots, 1):
-            ranking[spot] = rank
-        
-        return ranking
+        # 事前計算済みの距離行列から該当行を取り出す
+        distances = self.D[
+            self._name_to_idx[current_spot],
+            [self._name_to_idx[s] for s in remaining_spots]
+        ]
+
+        # 距離の近い順にランクを割り当て（距離が近い=ランクが低い）
+        return dict(zip(remaining_spots, _assign_ranks(distances).tolist()))
     
     def calculate_distance_ranking_from_location(self, lat, lon, remaining_spots):
         """
@@ -145,28 +364,40 @@ class RouteOptimizer:
         Returns:
             距離ランキング辞書（スポット名: ランク）
         """
-        distances = {}
-        
-        for spot in remaining_spots:
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            distance = self.calculate_distance(
-                lat, lon,
-                spot_data['緯度'], spot_data['経度']
-            )
-            distances[spot] = distance
-        
-        # 距離の近い順にソート
-        sorted_spots = sorted(distances.items(), key=lambda x: x[1])
-        
-        ranking = {}
-        for rank, (spot, _) in enumerate(sorted_spots, 1):
-            ranking[spot] = rank
-        
-        return ranking
+        if self._ball_tree is not None:
+            # BallTreeから距離昇順のスポット列を取得し、対象スポットの
+            # 出現順がそのままランクになる
+            query = np.array([[math.radians(lat), math.radians(lon)]])
+            _, indices = self._ball_tree.query(query, k=len(self._names))
+            members = set(remaining_spots)
+            ranking = {}
+            rank = 1
+            for i in indices[0]:
+                name = self._names[i]
+                if name in members:
+                    ranking[name] = rank
+                    rank += 1
+                    if rank > len(members):
+                        break
+            return ranking
+
+        # 事前計算済みのラジアン座標に対して距離を一括計算
+        coords = self._coords[[self._name_to_idx[s] for s in remaining_spots]]
+        distances = _calc_distance_rad(
+            math.radians(lat), math.radians(lon), coords[:, 0], coords[:, 1]
+        )
+
+        # 距離の近い順にランクを割り当て（argsortでソート処理を置き換え）
+        return dict(zip(remaining_spots, _assign_ranks(distances).tolist()))
     
     def optimize_route(self, selected_spots, user_location=None):
         """
         最適化ルートを計算
+        距離（近いほど良い）と時間効率（高いほど良い）をそれぞれ[0, 1]に
+        正規化した合成スコアが最小のスポットを順に選ぶ貪欲法で訪問順を
+        決め、その結果を2-opt法で改善する。最近傍型の貪欲法は交差のある
+        遠回りを残しやすいが、2-optの反転操作で総移動距離が局所最適まで
+        短縮される
         Args:
             selected_spots: 選択されたスポット名のリスト
             user_location: ユーザーの現在位置（辞書: {'lat': 緯度, 'lon': 経度}）
@@ -175,57 +406,69 @@ class RouteOptimizer:
         """
         if len(selected_spots) <= 1:
             return selected_spots
-        
-        remaining_spots = selected_spots.copy()
-        optimized_route = []
-        current_spot = None
-        
+
+        # 選択スポットを全体の行番号に変換し、以降は整数配列のみで扱う。
+        # 距離は事前計算済みのself.Dの表引きで済む
+        remaining = np.array([self._name_to_idx[s] for s in selected_spots])
+        route_idx = []
+
         # 最初のスポットを決定
         if user_location:
-            # ユーザー位置から最も近いスポットを最初に選択
-            distance_ranking = self.calculate_distance_ranking_from_location(
-                user_location['lat'], user_location['lon'], remaining_spots
+            # ユーザー位置からの距離と効率の正規化スコアが最小のスポット
+            coords = self._coords[remaining]
+            distances = _calc_distance_rad(
+                math.radians(user_location['lat']),
+                math.radians(user_location['lon']),
+                coords[:, 0], coords[:, 1]
             )
-            time_ranking = self.calculate_time_decrease_rate_ranking(remaining_spots)
-            
-            scores = {}
-            for spot in remaining_spots:
-                scores[spot] = distance_ranking[spot] + time_ranking[spot]
-            
-            first_spot = min(scores.items(), key=lambda x: x[1])[0]
-            optimized_route.append(first_spot)
-            remaining_spots.remove(first_spot)
-            current_spot = first_spot
+            scores = (_min_max_scale(distances)
+                      + _min_max_scale(-self._efficiency_all[remaining]))
+            k = int(np.argmin(scores))
         else:
             # ユーザー位置が不明な場合は、おすすめ度が最も高いスポットを選択
-            best_spot = max(remaining_spots, key=lambda spot: 
-                self.spots_df[self.spots_df['スポット名'] == spot]['おすすめ度'].iloc[0]
-            )
-            optimized_route.append(best_spot)
-            remaining_spots.remove(best_spot)
-            current_spot = best_spot
-        
+            k = int(np.argmax(self._recommend_all[remaining]))
+
+        current = remaining[k]
+        route_idx.append(current)
+        # 選択済み要素は末尾と入れ替えて切り詰める（remainingの並びは
+        # スコア計算に影響しないため、コピーを伴うnp.deleteは不要）
+        remaining[k] = remaining[-1]
+        remaining = remaining[:-1]
+
         # 残りのスポットを順次決定
-        while remaining_spots:
-            # 所要時間減少率ランキング
-            time_ranking = self.calculate_time_decrease_rate_ranking(remaining_spots)
-            
-            # 距離ランキング
-            distance_ranking = self.calculate_distance_ranking(current_spot, remaining_spots)
-            
-            # 合計スコア計算（Si = RW,i + RD,i）
-            scores = {}
-            for spot in remaining_spots:
-                scores[spot] = time_ranking[spot] + distance_ranking[spot]
-            
+        while remaining.size:
+            # 距離と効率を[0, 1]に正規化した合成スコアを計算。ランク付けの
+            # argsortが不要になり、貪欲法の1ステップがO(K)の縮約で済む
+            dist_row = self.D[current, remaining]
+            scores = (_min_max_scale(dist_row)
+                      + _min_max_scale(-self._efficiency_all[remaining]))
+
             # スコアが最小のスポットを選択
-            next_spot = min(scores.items(), key=lambda x: x[1])[0]
-            optimized_route.append(next_spot)
-            remaining_spots.remove(next_spot)
-            current_spot = next_spot
-        
-        return optimized_route
+            k = int(np.argmin(scores))
+            current = remaining[k]
+            route_idx.append(current)
+            remaining[k] = remaining[-1]
+            remaining = remaining[:-1]
+
+        # 貪欲法の結果を2-opt法で改善（開始スポットは固定）
+        route_idx = _two_opt(route_idx, self.D)
+
+        return [self._names[i] for i in route_idx]
     
+    def calculate_segment_distances(self, route):
+        """
+        ルートの連続する区間ごとの距離を一括計算
+        Args:
+            route: スポット名のリスト
+        Returns:
+            各区間の距離（km）のndarray（len(route)-1要素）
+        """
+        if len(route) < 2:
+            return np.zeros(0)
+
+        idx = np.array([self._name_to_idx[s] for s in route])
+        return self.D[idx[:-1], idx[1:]]
+
     def calculate_route_stats(self, route):
         """
         ルートの統計情報を計算
@@ -236,25 +479,13 @@ class RouteOptimizer:
         """
         if not route:
             return {}
-        
-        total_time = 0
-        total_distance = 0
-        total_recommend_score = 0
-        
-        for i, spot in enumerate(route):
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            total_time += spot_data['最低所要時間']
-            total_recommend_score += spot_data['おすすめ度']
-            
-            # 次のスポットまでの距離
-            if i < len(route) - 1:
-                next_spot = route[i + 1]
-                next_spot_data = self.spots_df[self.spots_df['スポット名'] == next_spot].iloc[0]
-                distance = self.calculate_distance(
-                    spot_data['緯度'], spot_data['経度'],
-                    next_spot_data['緯度'], next_spot_data['経度']
-                )
-                total_distance += distance
+
+        # 滞在時間とおすすめ度は列ごとに一括集計
+        total_time = self._by_name.loc[route, '最低所要時間'].sum()
+        total_recommend_score = self._by_name.loc[route, 'おすすめ度'].sum()
+
+        # 連続する区間の距離を1回のベクトル計算でまとめて求める
+        total_distance = float(self.calculate_segment_distances(route).sum())
         
         return {
             'total_spots': len(route),
@@ -1,11 +1,13 @@
+import copy
 import streamlit as st
 import pandas as pd
 import numpy as np
 import folium
 from streamlit_folium import st_folium
-import math
 import json
 
+from route_optimizer import RouteOptimizer, TourismCtx
+
 # ページ設定
 st.set_page_config(
     page_title="日田市観光最適化ルートナビ",
@@ -38,153 +40,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class RouteOptimizer:
-    """観光ルート最適化クラス"""
-    
-    def __init__(self, spots_df):
-        self.spots_df = spots_df
-    
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        """ヒュベニの公式を使用して2点間の距離を計算"""
-        # 度をラジアンに変換
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        # 平均緯度
-        P = (lat1_rad + lat2_rad) / 2
-        
-        # 緯度・経度の差
-        Dy = lat1_rad - lat2_rad
-        Dx = lon1_rad - lon2_rad
-        
-        # 地球楕円体のパラメータ（WGS84）
-        a = 6378137.0  # 長半径（m）
-        b = 6356752.314245  # 短半径（m）
-        e2 = (a**2 - b**2) / a**2  # 第一離心率の二乗
-        
-        # 子午線曲率半径
-        M = a * (1 - e2) / math.pow(1 - e2 * math.sin(P)**2, 1.5)
-        
-        # 卯酉線曲率半径
-        N = a / math.sqrt(1 - e2 * math.sin(P)**2)
-        
-        # ヒュベニの公式による距離計算
-        distance = math.sqrt((Dy * M)**2 + (Dx * N * math.cos(P))**2)
-        
-        # メートルからキロメートルに変換
-        return distance / 1000
-    
-    def calculate_time_decrease_rate_ranking(self, spots, current_time=0):
-        """所要時間減少率ランキングを計算"""
-        time_efficiency = {}
-        
-        for spot in spots:
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            efficiency = spot_data['おすすめ度'] / spot_data['最低所要時間']
-            time_efficiency[spot] = efficiency
-        
-        sorted_spots = sorted(time_efficiency.items(), key=lambda x: x[1], reverse=True)
-        
-        ranking = {}
-        for rank, (spot, _) in enumerate(sorted_spots, 1):
-            ranking[spot] = rank
-        
-        return ranking
-    
-    def calculate_distance_ranking(self, current_spot, remaining_spots):
-        """現在のスポットから他スポットまでの距離ランキングを計算"""
-        if current_spot is None:
-            return {spot: 1 for spot in remaining_spots}
-        
-        distances = {}
-        current_spot_data = self.spots_df[self.spots_df['スポット名'] == current_spot].iloc[0]
-        
-        for spot in remaining_spots:
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            distance = self.calculate_distance(
-                current_spot_data['緯度'], current_spot_data['経度'],
-                spot_data['緯度'], spot_data['経度']
-            )
-            distances[spot] = distance
-        
-        sorted_spots = sorted(distances.items(), key=lambda x: x[1])
-        
-        ranking = {}
-        for rank, (spot, _) in enumerate(sorted_spots, 1):
-            ranking[spot] = rank
-        
-        return ranking
-    
-    def calculate_distance_ranking_from_location(self, lat, lon, remaining_spots):
-        """指定位置から他スポットまでの距離ランキングを計算"""
-        distances = {}
-        
-        for spot in remaining_spots:
-            spot_data = self.spots_df[self.spots_df['スポット名'] == spot].iloc[0]
-            distance = self.calculate_distance(
-                lat, lon,
-                spot_data['緯度'], spot_data['経度']
-            )
-            distances[spot] = distance
-        
-        sorted_spots = sorted(distances.items(), key=lambda x: x[1])
-        
-        ranking = {}
-        for rank, (spot, _) in enumerate(sorted_spots, 1):
-            ranking[spot] = rank
-        
-        return ranking
-    
-    def optimize_route(self, selected_spots, user_location=None):
-        """最適化ルートを計算"""
-        if len(selected_spots) <= 1:
-            return selected_spots
-        
-        remaining_spots = selected_spots.copy()
-        optimized_route = []
-        current_spot = None
-        
-        # 最初のスポットを決定
-        if user_location:
-            distance_ranking = self.calculate_distance_ranking_from_location(
-                user_location['lat'], user_location['lon'], remaining_spots
-            )
-            time_ranking = self.calculate_time_decrease_rate_ranking(remaining_spots)
-            
-            scores = {}
-            for spot in remaining_spots:
-                scores[spot] = distance_ranking[spot] + time_ranking[spot]
-            
-            first_spot = min(scores.items(), key=lambda x: x[1])[0]
-            optimized_route.append(first_spot)
-            remaining_spots.remove(first_spot)
-            current_spot = first_spot
-        else:
-            best_spot = max(remaining_spots, key=lambda spot: 
-                self.spots_df[self.spots_df['スポット名'] == spot]['おすすめ度'].iloc[0]
-            )
-            optimized_route.append(best_spot)
-            remaining_spots.remove(best_spot)
-            current_spot = best_spot
-        
-        # 残りのスポットを順次決定
-        while remaining_spots:
-            time_ranking = self.calculate_time_decrease_rate_ranking(remaining_spots)
-            distance_ranking = self.calculate_distance_ranking(current_spot, remaining_spots)
-            
-            scores = {}
-            for spot in remaining_spots:
-                scores[spot] = time_ranking[spot] + distance_ranking[spot]
-            
-            next_spot = min(scores.items(), key=lambda x: x[1])[0]
-            optimized_route.append(next_spot)
-            remaining_spots.remove(next_spot)
-            current_spot = next_spot
-        
-        return optimized_route
-
 @st.cache_data
 def load_tourism_data():
     """観光スポットデータを読み込む"""
@@ -243,6 +98,65 @@ def load_tourism_data():
     }
     return pd.DataFrame(demo_data)
 
+@st.cache_data
+def get_spots_by_name(spots_df):
+    """スポット名で引ける索引付きDataFrameを返す
+
+    表示ループ内の「名前でスポットを探す」処理を、毎回のブールマスク
+    走査からO(1)のインデックス参照に置き換えるためのキャッシュ
+    """
+    return spots_df.set_index('スポット名')
+
+@st.cache_resource
+def build_ctx():
+    """前計算済みの観光データコンテキストを構築して再実行間で共有する
+
+    座標配列・名前索引・距離行列の構築はここで一度だけ行い、以降の
+    再実行は参照の取得だけになる
+    """
+    return TourismCtx.from_df(load_tourism_data())
+
+@st.cache_resource
+def get_optimizer():
+    """RouteOptimizerを構築して再実行間で共有する
+
+    Streamlitはウィジェット操作のたびにスクリプト全体を再実行するため、
+    前計算を含むオプティマイザはリソースとしてキャッシュする
+    """
+    return RouteOptimizer(build_ctx())
+
+@st.cache_data
+def build_route_table(route, spots_df):
+    """最適化ルートの表示用テーブルと総移動距離を構築してキャッシュする
+
+    行数が高々20程度の表示専用テーブルなので、DataFrameを介さず
+    st.tableへそのまま渡せる辞書のリストとして組み立てる。ルートが
+    変わらない再実行（フィルタ操作など）ではキャッシュを返す
+    Args:
+        route: 最適化されたルート（スポット名のタプル）
+        spots_df: 観光スポットのDataFrame
+    Returns:
+        (表示用の辞書リスト, 総移動距離km)のタプル
+    """
+    # 区間距離と所要時間はctxの距離行列・配列の表引きだけで得られる
+    ctx = build_ctx()
+    route_idx = np.fromiter((ctx.idx[s] for s in route), int, count=len(route))
+    segment_distances = ctx.D[route_idx[:-1], route_idx[1:]]
+    total_distance = float(segment_distances.sum())
+    times = ctx.times[route_idx]
+
+    route_info = []
+    for i, spot_name in enumerate(route):
+        distance_to_next = segment_distances[i] if i < len(route) - 1 else 0
+        route_info.append({
+            '順序': i + 1,
+            'スポット名': spot_name,
+            '所要時間': f"{times[i]}分",
+            '次スポットまでの距離': f"{distance_to_next:.2f}km" if distance_to_next > 0 else "-"
+        })
+
+    return route_info, total_distance
+
 def get_user_location():
     """簡易的な位置情報取得（デモ用）"""
     if st.sidebar.button("📍 位置情報を取得（デモ）"):
@@ -256,13 +170,79 @@ def get_user_location():
         return demo_location
     return None
 
-def create_map(spots_df, selected_spots=None, optimized_route=None, user_location=None):
-    """地図を作成する"""
+# ルート順序マーカーのHTML。内容は順番の数字だけなので起動時に前計算する
+_NODE_HTML = [
+    f'<div style="background-color: red; color: white; border-radius: 50%; '
+    f'width: 30px; height: 30px; text-align: center; line-height: 30px; '
+    f'font-weight: bold;">{i + 1}</div>'
+    for i in range(64)
+]
+
+def _spot_popup_text(name, row):
+    """スポットマーカー用のポップアップHTMLを組み立てる"""
+    return f"""
+        <b>{name}</b><br>
+        所要時間: {row['最低所要時間']}分<br>
+        おすすめ度: {'★' * row['おすすめ度']}<br>
+        {row['説明'][:50]}...
+        """
+
+@st.cache_data
+def get_spot_popups(spots_df):
+    """スポットごとのポップアップHTMLを前計算して辞書で返す
+
+    内容はスポットデータのみに依存するため、一度組み立てれば
+    ベース地図とハイライトマーカーの両方で使い回せる
+    """
+    return {
+        row['スポット名']: _spot_popup_text(row['スポット名'], row)
+        for _, row in spots_df.iterrows()
+    }
+
+@st.cache_data
+def get_spot_cards(spots_df):
+    """選択中スポットのカードHTMLを前計算して辞書で返す
+
+    星表示や説明の切り出しを含めてスポットデータのみで決まるため、
+    再実行のたびに文字列を組み立て直す必要はない
+    """
+    cards = {}
+    for _, row in spots_df.iterrows():
+        cards[row['スポット名']] = f"""
+                <div class="spot-card">
+                    <h4>{row['スポット名']}</h4>
+                    <p><strong>所要時間:</strong> {row['最低所要時間']}分</p>
+                    <p><strong>おすすめ度:</strong> {'★' * row['おすすめ度']}</p>
+                    <p>{row['説明'][:100]}...</p>
+                </div>
+                """
+    return cards
+
+@st.cache_resource
+def _base_map(spots_df):
+    """全スポットのマーカーを載せたベース地図を一度だけ構築する
+
+    スポットマーカーのHTML生成はcreate_mapで最も重い処理だが内容は
+    不変なので、リソースとしてキャッシュし再実行間で共有する
+    """
     center_lat = spots_df['緯度'].mean()
     center_lon = spots_df['経度'].mean()
-    
+
     m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
-    
+
+    popups = get_spot_popups(spots_df)
+    for idx, row in spots_df.iterrows():
+        folium.Marker(
+            [row['緯度'], row['経度']],
+            popup=folium.Popup(popups[row['スポット名']], max_width=300),
+            icon=folium.Icon(color='blue', icon='info-sign')
+        ).add_to(m)
+
+    return m
+
+def add_route_overlay(m, spots_df, selected_spots=None, optimized_route=None,
+                      user_location=None):
+    """再実行ごとに変わる要素（選択・ルート・現在位置）だけを地図に追加"""
     # ユーザーの現在位置を表示
     if user_location:
         folium.Marker(
@@ -270,38 +250,32 @@ def create_map(spots_df, selected_spots=None, optimized_route=None, user_locatio
             popup="現在位置",
             icon=folium.Icon(color='red', icon='user', prefix='fa')
         ).add_to(m)
-    
+
+    spots_by_name = get_spots_by_name(spots_df)
+
     # 選択されたスポットをハイライト
-    for idx, row in spots_df.iterrows():
-        color = 'green' if selected_spots and row['スポット名'] in selected_spots else 'blue'
-        popup_text = f"""
-        <b>{row['スポット名']}</b><br>
-        所要時間: {row['最低所要時間']}分<br>
-        おすすめ度: {'★' * row['おすすめ度']}<br>
-        {row['説明'][:50]}...
-        """
-        
-        folium.Marker(
-            [row['緯度'], row['経度']],
-            popup=folium.Popup(popup_text, max_width=300),
-            icon=folium.Icon(color=color, icon='info-sign')
-        ).add_to(m)
-    
+    if selected_spots:
+        popups = get_spot_popups(spots_df)
+        for spot_name in selected_spots:
+            row = spots_by_name.loc[spot_name]
+            folium.Marker(
+                [row['緯度'], row['経度']],
+                popup=folium.Popup(popups[spot_name], max_width=300),
+                icon=folium.Icon(color='green', icon='info-sign')
+            ).add_to(m)
+
     # 最適化ルートを表示
     if optimized_route and len(optimized_route) > 1:
         route_coords = []
         for i, spot_name in enumerate(optimized_route):
-            spot_data = spots_df[spots_df['スポット名'] == spot_name].iloc[0]
+            spot_data = spots_by_name.loc[spot_name]
             route_coords.append([spot_data['緯度'], spot_data['経度']])
             
             # ルート順序を表示
             folium.Marker(
                 [spot_data['緯度'], spot_data['経度']],
                 popup=f"順序: {i+1} - {spot_name}",
-                icon=folium.DivIcon(
-                    html=f'<div style="background-color: red; color: white; border-radius: 50%; width: 30px; height: 30px; text-align: center; line-height: 30px; font-weight: bold;">{i+1}</div>',
-                    icon_size=(30, 30)
-                )
+                icon=folium.DivIcon(html=_NODE_HTML[i], icon_size=(30, 30))
             ).add_to(m)
         
         # ルートライン
@@ -311,9 +285,18 @@ def create_map(spots_df, selected_spots=None, optimized_route=None, user_locatio
             weight=3,
             opacity=0.8
         ).add_to(m)
-    
+
     return m
 
+def create_map(spots_df, selected_spots=None, optimized_route=None, user_location=None):
+    """地図を作成する
+
+    キャッシュ済みのベース地図を複製し、可変のオーバーレイだけを載せる
+    """
+    m = copy.deepcopy(_base_map(spots_df))
+    return add_route_overlay(m, spots_df, selected_spots, optimized_route,
+                             user_location)
+
 def main():
     st.markdown('<h1 class="main-header">🗾 日田市観光最適化ルートナビ</h1>', unsafe_allow_html=True)
     
@@ -342,12 +325,23 @@ def main():
     with col1:
         st.subheader("🗺️ 観光スポットマップ")
         
-        # 最適化ルート計算
+        # 最適化ルート計算。ルートは選択スポットと現在位置だけで決まる
+        # ため、その組をキーにセッション状態へ記憶し、フィルタ操作などの
+        # 無関係な再実行では前回の結果をそのまま使う
         optimized_route = None
         if len(selected_spots) > 1:
-            optimizer = RouteOptimizer(spots_df)
             user_loc = st.session_state.get('user_location', None)
-            optimized_route = optimizer.optimize_route(selected_spots, user_loc)
+            route_key = (
+                tuple(selected_spots),
+                None if not user_loc else
+                (round(user_loc['lat'], 5), round(user_loc['lon'], 5))
+            )
+            if st.session_state.get('route_key') != route_key:
+                st.session_state.optimized_route = get_optimizer().optimize_route(
+                    selected_spots, user_loc
+                )
+                st.session_state.route_key = route_key
+            optimized_route = st.session_state.optimized_route
         
         # 地図表示
         user_location = st.session_state.get('user_location', None)
@@ -360,58 +354,28 @@ def main():
         if not selected_spots:
             st.info("左側から観光スポットを選択してください")
         else:
-            total_time = 0
-            for spot in selected_spots:
-                spot_data = spots_df[spots_df['スポット名'] == spot].iloc[0]
-                total_time += spot_data['最低所要時間']
-                
-                st.markdown(f"""
-                <div class="spot-card">
-                    <h4>{spot}</h4>
-                    <p><strong>所要時間:</strong> {spot_data['最低所要時間']}分</p>
-                    <p><strong>おすすめ度:</strong> {'★' * spot_data['おすすめ度']}</p>
-                    <p>{spot_data['説明'][:100]}...</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown(f"""
+            spots_by_name = get_spots_by_name(spots_df)
+            spot_cards = get_spot_cards(spots_df)
+            total_time = spots_by_name.loc[list(selected_spots), '最低所要時間'].sum()
+
+            # カードとルート情報を連結し、1回のst.markdownでまとめて描画する
+            # （スポットごとに呼ぶとStreamlitのメッセージがN回飛ぶ）
+            panel_html = ''.join(spot_cards[spot] for spot in selected_spots)
+            panel_html += f"""
             <div class="route-info">
                 <h4>📊 ルート情報</h4>
                 <p><strong>選択スポット数:</strong> {len(selected_spots)}箇所</p>
                 <p><strong>合計所要時間:</strong> 約{total_time}分</p>
             </div>
-            """, unsafe_allow_html=True)
+            """
+            st.markdown(panel_html, unsafe_allow_html=True)
     
     # 最適化ルート表示
     if optimized_route and len(optimized_route) > 1:
         st.subheader("🛣️ 最適化ルート")
         
-        route_info = []
-        optimizer = RouteOptimizer(spots_df)
-        total_distance = 0
-        
-        for i in range(len(optimized_route)):
-            spot_name = optimized_route[i]
-            spot_data = spots_df[spots_df['スポット名'] == spot_name].iloc[0]
-            
-            distance_to_next = 0
-            if i < len(optimized_route) - 1:
-                next_spot = spots_df[spots_df['スポット名'] == optimized_route[i+1]].iloc[0]
-                distance_to_next = optimizer.calculate_distance(
-                    spot_data['緯度'], spot_data['経度'],
-                    next_spot['緯度'], next_spot['経度']
-                )
-                total_distance += distance_to_next
-            
-            route_info.append({
-                '順序': i + 1,
-                'スポット名': spot_name,
-                '所要時間': f"{spot_data['最低所要時間']}分",
-                '次スポットまでの距離': f"{distance_to_next:.2f}km" if distance_to_next > 0 else "-"
-            })
-        
-        route_df = pd.DataFrame(route_info)
-        st.dataframe(route_df, use_container_width=True)
+        route_info, total_distance = build_route_table(tuple(optimized_route), spots_df)
+        st.table(route_info)
         
         st.info(f"💡 総移動距離: 約{total_distance:.2f}km")
         
@@ -420,13 +384,12 @@ def main():
         if st.button("📱 ルートナビを開始"):
             st.success("ナビゲーションを開始します！各スポットを順番に訪問してください。")
             
-            # Google Mapsリンク生成
-            waypoints = []
-            for spot in optimized_route:
-                spot_data = spots_df[spots_df['スポット名'] == spot].iloc[0]
-                waypoints.append(f"{spot_data['緯度']},{spot_data['経度']}")
-            
-            google_maps_url = f"https://www.google.com/maps/dir/{'/'.join(waypoints)}"
+            # Google Mapsリンク生成（ctxで前計算済みの座標文字列を連結）
+            ctx = build_ctx()
+            waypoints = '/'.join(
+                ctx.latlon_str[ctx.idx[spot]] for spot in optimized_route
+            )
+            google_maps_url = f"https://www.google.com/maps/dir/{waypoints}"
             st.markdown(f"[🗺️ Google Mapsで開く]({google_maps_url})")
     
     # スポット詳細情報
@@ -439,10 +402,11 @@ def main():
     with col2:
         max_time = st.slider("最大所要時間（分）", 30, 300, 300)
     
-    filtered_df = spots_df[
-        (spots_df['おすすめ度'] >= min_recommend) & 
-        (spots_df['最低所要時間'] <= max_time)
-    ]
+    # フィルタ判定は前計算済みのndarray列に対して行い、
+    # 中間Seriesの割り当てを避ける
+    ctx = build_ctx()
+    mask = (ctx.recs >= min_recommend) & (ctx.times <= max_time)
+    filtered_df = spots_df.iloc[np.flatnonzero(mask)]
     
     st.dataframe(
         filtered_df[['スポット名', '最低所要時間', 'おすすめ度', '説明']],